@@ -0,0 +1,65 @@
+"""Write synthetic clubs.json and competitions.json files of any size.
+
+    python benchmarks/generate.py data --clubs 100000 --competitions 50000
+
+Records are streamed to disk, so generating large datasets needs little
+memory. Most competitions are in the future, a few in the past, and some
+are sold out, so every code path of the booking flow gets exercised.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def clubRecord(number, rng):
+    return {'name': 'Club {:07d}'.format(number),
+            'email': 'secretary{:07d}@club.example'.format(number),
+            'points': str(rng.randint(0, 60))}
+
+
+def competitionRecord(number, rng, now):
+    offset = timedelta(hours=rng.randint(-24 * 60, 24 * 730))
+    places = 0 if rng.random() < 0.05 else rng.randint(1, 200)
+    return {'name': 'Competition {:07d}'.format(number),
+            'date': (now + offset).strftime(DATE_FORMAT),
+            'numberOfPlaces': str(places)}
+
+
+def writeRecords(path, key, records):
+    with open(path, 'w') as output:
+        output.write('{{\n    "{}": [\n'.format(key))
+        for number, record in enumerate(records):
+            if number:
+                output.write(',\n')
+            output.write('        ' + json.dumps(record))
+        output.write('\n    ]\n}\n')
+
+
+def generate(directory, clubs, competitions, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    writeRecords(os.path.join(directory, 'clubs.json'), 'clubs',
+                 (clubRecord(number, rng) for number in range(clubs)))
+    writeRecords(os.path.join(directory, 'competitions.json'), 'competitions',
+                 (competitionRecord(number, rng, now)
+                  for number in range(competitions)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory')
+    parser.add_argument('--clubs', type=int, default=100000)
+    parser.add_argument('--competitions', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+    generate(arguments.directory, arguments.clubs, arguments.competitions,
+             arguments.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""Benchmark the login -> book -> purchase flow on a synthetic dataset.
+
+    python benchmarks/run.py --clubs 100000 --competitions 50000 --label v2
+
+Each scenario (storage backend x single-threaded or concurrent) runs in a
+fresh process on a fresh copy of the data, driving the app through the
+Flask test client; start-up is timed once the JSON indexes exist.
+Throughput, p50/p99 latency per step, start-up time and peak RSS are saved
+to benchmarks/results/<label>.json and compared with a baseline result (by
+default the latest other result for the same dataset size); changes worse
+than --threshold are flagged as regressions.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+RESULTS = os.path.join(HERE, 'results')
+STEPS = ('login', 'book', 'purchase', 'flow')
+# For each metric, whether a bigger number is better.
+METRICS = {'throughput': True, 'startup': False, 'peakRss': False}
+METRICS.update({'{}.{}'.format(step, quantile): False
+                for step in STEPS for quantile in ('p50', 'p99')})
+
+sys.path.insert(0, HERE)
+
+from generate import generate  # noqa: E402
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def peakRss():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def worker(flows, threads, seed):
+    """Run inside the scenario's data directory; print the measurements."""
+    sys.path.insert(0, ROOT)
+    started = time.perf_counter()
+    import server
+    startup = time.perf_counter() - started
+    clubCount = len(server.clubs)
+    targets = [competition.name for competition
+               in server.catalogue.upcoming(available=True)]
+    if not clubCount or not targets:
+        raise SystemExit('The dataset has no clubs or bookable competitions')
+    timings = {step: [] for step in STEPS}
+    failures = []
+    lock = threading.Lock()
+
+    def run(count, rng):
+        client = server.app.test_client()
+        local = {step: [] for step in STEPS}
+        for _ in range(count):
+            number = rng.randrange(clubCount)
+            name = 'Club {:07d}'.format(number)
+            email = 'secretary{:07d}@club.example'.format(number)
+            competition = targets[rng.randrange(len(targets))]
+            responses = []
+            marks = [time.perf_counter()]
+            responses.append(client.post('/showSummary',
+                                         data={'email': email}))
+            marks.append(time.perf_counter())
+            responses.append(client.get('/book/{}'.format(
+                quote(competition))))
+            marks.append(time.perf_counter())
+            responses.append(client.post('/purchasePlaces', data={
+                'competition': competition, 'club': name, 'places': '1'}))
+            marks.append(time.perf_counter())
+            for step, begin, end in zip(STEPS, marks, marks[1:]):
+                local[step].append(end - begin)
+            local['flow'].append(marks[-1] - marks[0])
+            bad = [response.status_code for response in responses
+                   if response.status_code != 200]
+            if bad:
+                with lock:
+                    failures.append(bad)
+        with lock:
+            for step in STEPS:
+                timings[step].extend(local[step])
+
+    shares = [flows // threads + (index < flows % threads)
+              for index in range(threads)]
+    workers = [threading.Thread(target=run,
+                                args=(share, random.Random(seed + index)))
+               for index, share in enumerate(shares)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    result = {'flows': flows, 'threads': threads, 'startup': startup,
+              'throughput': flows / elapsed, 'peakRss': peakRss(),
+              'failures': len(failures)}
+    for step in STEPS:
+        result[step + '.p50'] = percentile(timings[step], 0.50)
+        result[step + '.p99'] = percentile(timings[step], 0.99)
+    server.storage.close()
+    print(json.dumps(result))
+
+
+def runScenario(dataset, backend, flows, threads, seed):
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ)
+        env.pop('GUDLFT_METRICS', None)
+        if backend == 'sqlite':
+            database = os.path.join(directory, 'gudlft.db')
+            subprocess.run(
+                [sys.executable, os.path.join(ROOT, 'storage.py'), 'import',
+                 database, os.path.join(dataset, 'clubs.json'),
+                 os.path.join(dataset, 'competitions.json')],
+                check=True, stdout=subprocess.DEVNULL)
+            env['GUDLFT_DATABASE'] = database
+        # The JSON backend always needs the files: it is the default.
+        for name in ('clubs.json', 'competitions.json'):
+            shutil.copy(os.path.join(dataset, name), directory)
+        if backend == 'json':
+            # Build the lazy loader's indexes so start-up is measured warm.
+            subprocess.run([sys.executable, '-c', 'import server'],
+                           cwd=directory, env=dict(env, PYTHONPATH=ROOT),
+                           check=True)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker',
+             '--flows', str(flows), '--threads', str(threads),
+             '--seed', str(seed)],
+            cwd=directory, env=env, check=True, stdout=subprocess.PIPE,
+            universal_newlines=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def gitCommit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def findBaseline(result, path):
+    candidates = []
+    for other in glob.glob(os.path.join(RESULTS, '*.json')):
+        if os.path.abspath(other) == os.path.abspath(path):
+            continue
+        with open(other) as saved:
+            previous = json.load(saved)
+        if previous.get('dataset') == result['dataset']:
+            candidates.append((previous.get('finished', 0), other, previous))
+    return max(candidates, key=lambda item: item[0])[1:] \
+        if candidates else (None, None)
+
+
+def compare(result, baseline, threshold):
+    """Print every metric next to its baseline; return the regressions."""
+    regressions = []
+    print('{:<20} {:<16} {:>14} {:>14} {:>9}'.format(
+        'scenario', 'metric', 'baseline', 'current', 'change'))
+    for scenario, current in sorted(result['scenarios'].items()):
+        previous = (baseline or {}).get('scenarios', {}).get(scenario, {})
+        for metric, higherIsBetter in sorted(METRICS.items()):
+            value = current.get(metric)
+            old = previous.get(metric)
+            change = ''
+            if value is not None and old:
+                ratio = value / old - 1
+                change = '{:+.1%}'.format(ratio)
+                worse = -ratio if higherIsBetter else ratio
+                if worse > threshold:
+                    change += ' REGRESSION'
+                    regressions.append((scenario, metric))
+            print('{:<20} {:<16} {:>14} {:>14} {:>9}'.format(
+                scenario, metric, _format(old), _format(value), change))
+    return regressions
+
+
+def _format(value):
+    if value is None:
+        return '-'
+    return '{:.6g}'.format(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clubs', type=int, default=100000)
+    parser.add_argument('--competitions', type=int, default=50000)
+    parser.add_argument('--flows', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8,
+                        help='threads for the concurrent scenarios')
+    parser.add_argument('--backends', default='json,sqlite')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label', default=time.strftime('%Y%m%d-%H%M%S'))
+    parser.add_argument('--baseline', help='result file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    parser.add_argument('--worker', action='store_true',
+                        help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+    if arguments.worker:
+        worker(arguments.flows, arguments.threads, arguments.seed)
+        return
+
+    dataset = os.path.join(HERE, 'data', '{}x{}-{}'.format(
+        arguments.clubs, arguments.competitions, arguments.seed))
+    if not os.path.exists(os.path.join(dataset, 'competitions.json')):
+        print('Generating dataset in {}'.format(dataset))
+        generate(dataset, arguments.clubs, arguments.competitions,
+                 arguments.seed)
+    result = {'label': arguments.label, 'commit': gitCommit(),
+              'python': platform.python_version(),
+              'dataset': {'clubs': arguments.clubs,
+                          'competitions': arguments.competitions,
+                          'seed': arguments.seed},
+              'scenarios': {}}
+    modes = (('single', 1), ('concurrent', arguments.threads))
+    for backend in arguments.backends.split(','):
+        for mode, threads in modes:
+            scenario = '{}-{}'.format(backend, mode)
+            print('Running {}'.format(scenario))
+            result['scenarios'][scenario] = runScenario(
+                dataset, backend, arguments.flows, threads, arguments.seed)
+    result['finished'] = time.time()
+
+    os.makedirs(RESULTS, exist_ok=True)
+    path = os.path.join(RESULTS, arguments.label + '.json')
+    if arguments.baseline:
+        baselinePath = arguments.baseline
+        with open(baselinePath) as saved:
+            baseline = json.load(saved)
+    else:
+        baselinePath, baseline = findBaseline(result, path)
+    with open(path, 'w') as saved:
+        json.dump(result, saved, indent=4)
+    print('Saved {}; baseline: {}'.format(path, baselinePath or 'none'))
+    regressions = compare(result, baseline, arguments.threshold)
+    failures = sum(scenario['failures']
+                   for scenario in result['scenarios'].values())
+    if failures:
+        print('{} flows got a non-200 response'.format(failures))
+    if regressions or failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Hammer one competition from many threads and check nothing is oversold.
+
+Run from the repository root:
+
+    python benchmarks/stress_booking.py --threads 32 --places 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from booking import BookingEngine, BookingError  # noqa: E402
+from journal import BookingJournal  # noqa: E402
+from models import Club, Competition  # noqa: E402
+from registry import Registry  # noqa: E402
+
+
+def stress(threads, places, attempts, points):
+    competitions = Registry(
+        [Competition(name='Stress Open', date='2030-01-01 10:00:00',
+                     numberOfPlaces=places)], keys=('name',))
+    clubs = Registry(
+        [Club(name='Club {}'.format(i), email='club{}@example.com'.format(i),
+              points=points) for i in range(threads)],
+        keys=('email', 'name'))
+    with tempfile.TemporaryDirectory() as directory:
+        journal = BookingJournal(os.path.join(directory, 'bookings.journal'))
+        journal.open()
+        engine = BookingEngine(competitions, clubs, journal)
+        competition = competitions.get('name', 'Stress Open')
+        booked = [0] * threads
+        start = threading.Barrier(threads)
+
+        def hammer(number):
+            club = clubs.get('name', 'Club {}'.format(number))
+            start.wait()
+            for attempt in range(attempts):
+                try:
+                    engine.book(competition, club, 1 + attempt % 3)
+                except BookingError:
+                    continue
+                booked[number] += 1 + attempt % 3
+
+        workers = [threading.Thread(target=hammer, args=(number,))
+                   for number in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        journal.close()
+
+    placesLeft = competition.numberOfPlaces
+    assert placesLeft >= 0, 'oversold: {} places left'.format(placesLeft)
+    assert places - placesLeft == sum(booked), 'lost or phantom bookings'
+    for number, club in enumerate(clubs):
+        assert club.points == points - booked[number], club.name
+        assert club.points >= 0, club.name
+    return sum(booked), placesLeft
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--places', type=int, default=500)
+    parser.add_argument('--attempts', type=int, default=50)
+    parser.add_argument('--points', type=int, default=40)
+    arguments = parser.parse_args()
+    booked, placesLeft = stress(arguments.threads, arguments.places,
+                                arguments.attempts, arguments.points)
+    print('booked {} places, {} left, no overselling'.format(
+        booked, placesLeft))
+
+
+if __name__ == '__main__':
+    main()
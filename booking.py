@@ -0,0 +1,59 @@
+import threading
+from contextlib import ExitStack
+
+
+class BookingError(Exception):
+    pass
+
+
+class BookingEngine:
+    """Checks and deducts competition places and club points atomically.
+
+    Each competition and each club has its own lock, always taken in the
+    same order (competition, then club), so bookings for unrelated
+    competitions and clubs never wait on each other.
+
+    The locks are held until the booking is committed, so the next
+    booking for the same competition checks places that are already
+    durable; releasing them earlier would need reserving places and
+    undoing the reservation when a commit fails. The cost is that
+    bookings for one competition commit one sync at a time, and group
+    commit only batches bookings for different competitions.
+    """
+
+    def __init__(self, competitions, clubs, storage):
+        self.competitions = competitions
+        self.clubs = clubs
+        self.storage = storage
+        self._guard = threading.Lock()
+        self._locks = {}
+
+    def lock(self, kind, name):
+        key = (kind, name)
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault(key, threading.Lock())
+        return lock
+
+    def book(self, competition, club, places):
+        if places <= 0:
+            raise BookingError('Please book at least one place.')
+        with ExitStack() as stack:
+            stack.enter_context(self.lock('competition', competition.name))
+            stack.enter_context(self.lock('club', club.name))
+            placesLeft = competition.numberOfPlaces
+            pointsLeft = club.points
+            if places > placesLeft:
+                raise BookingError(
+                    'Only {} places left in this competition.'.format(
+                        placesLeft))
+            if places > pointsLeft:
+                raise BookingError(
+                    'You only have {} points available.'.format(pointsLeft))
+            event = {'competition': competition.name, 'club': club.name,
+                     'places': places, 'points': places}
+            with self.storage.booking(event):
+                self.competitions.update(
+                    competition, numberOfPlaces=placesLeft - places)
+                self.clubs.update(club, points=pointsLeft - places)
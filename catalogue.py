@@ -0,0 +1,142 @@
+import threading
+from bisect import bisect_left
+from datetime import datetime
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class CatalogueRange:
+    """Positions `low` to `high` of a sorted key list, sliced on demand."""
+
+    def __init__(self, competitions, keys, low, high):
+        self.competitions = competitions
+        self.keys = keys
+        self.low = low
+        self.high = high
+
+    def __len__(self):
+        return self.high - self.low
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            return [self.competitions.get('name', name) for _, name in
+                    self.keys[self.low + start:self.low + stop:step]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.competitions.get('name', self.keys[self.low + index][1])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class CompetitionCatalogue:
+    """Competitions ordered by date, with dates parsed once when filed.
+
+    Two sorted lists of (date, name) keys are kept, one for every
+    competition and one for those with places left, so "upcoming",
+    "between" and "next N" queries are a bisection away. The lists are
+    built on the first such query, not at start-up, and copied on write:
+    queries hold on to the list they bisected while a new competition or
+    a sell-out swaps in a fresh one.
+    """
+
+    def __init__(self, competitions):
+        self.competitions = competitions
+        self._lock = threading.Lock()
+        self._dates = {}
+        self._all = None
+        self._available = None
+
+    def add(self, competition):
+        with self._lock:
+            if self._all is None:
+                return
+            self._dates[competition.name] = parseDate(competition.date)
+            key = (self._dates[competition.name], competition.name)
+            self._all = _inserted(self._all, key)
+            if competition.numberOfPlaces > 0:
+                self._available = _inserted(self._available, key)
+
+    def remove(self, competition):
+        with self._lock:
+            if self._all is None:
+                return
+            key = (self._dates.pop(competition.name), competition.name)
+            self._all = _discarded(self._all, key)
+            self._available = _discarded(self._available, key)
+
+    def updated(self, competition):
+        """Re-file `competition` after its places changed."""
+        with self._lock:
+            if self._all is None:
+                return
+            key = (self._dates[competition.name], competition.name)
+            if competition.numberOfPlaces > 0:
+                self._available = _inserted(self._available, key)
+            else:
+                self._available = _discarded(self._available, key)
+
+    def date(self, competition):
+        date = self._dates.get(competition.name)
+        return parseDate(competition.date) if date is None else date
+
+    def isPast(self, competition, now=None):
+        return self.date(competition) < (now or datetime.now())
+
+    def between(self, start=None, end=None, available=False):
+        """Competitions starting from `start` and before `end`."""
+        keys = self._keys(available)
+        low = 0 if start is None else bisect_left(keys, (start,))
+        high = len(keys) if end is None else bisect_left(keys, (end,))
+        return CatalogueRange(self.competitions, keys, low, max(low, high))
+
+    def upcoming(self, now=None, available=False):
+        return self.between(now or datetime.now(), available=available)
+
+    def nextN(self, count, now=None, available=False):
+        keys = self._keys(available)
+        low = bisect_left(keys, (now or datetime.now(),))
+        return CatalogueRange(self.competitions, keys, low,
+                              min(len(keys), low + count))
+
+    def _keys(self, available):
+        if self._all is None:
+            with self._lock:
+                if self._all is None:
+                    self._build()
+        return self._available if available else self._all
+
+    def _build(self):
+        everything, available = [], []
+        for competition in self.competitions:
+            self._dates[competition.name] = parseDate(competition.date)
+            key = (self._dates[competition.name], competition.name)
+            everything.append(key)
+            if competition.numberOfPlaces > 0:
+                available.append(key)
+        everything.sort()
+        available.sort()
+        self._available = available
+        self._all = everything
+
+
+def parseDate(value):
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def _inserted(keys, key):
+    index = bisect_left(keys, key)
+    if index < len(keys) and keys[index] == key:
+        return keys
+    return keys[:index] + [key] + keys[index:]
+
+
+def _discarded(keys, key):
+    index = bisect_left(keys, key)
+    if index < len(keys) and keys[index] == key:
+        return keys[:index] + keys[index + 1:]
+    return keys
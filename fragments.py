@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """LRU cache of rendered template fragments, invalidated by tag.
+
+    Each fragment is stored with the tags it depends on (for instance the
+    names of the competitions it lists) and an optional expiry time;
+    invalidate(tag) drops every fragment carrying that tag. Take a
+    generation() before rendering and pass it to set(), so a fragment
+    rendered from data invalidated in the meantime is not stored.
+    """
+
+    def __init__(self, maxSize=1024):
+        self.maxSize = maxSize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tagged = {}
+        self._generation = 0
+        self._invalidatedAt = {}
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            fragment, tags, expires = entry
+            if expires is not None and expires <= time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return fragment
+
+    def set(self, key, fragment, tags=(), expires=None, since=None):
+        with self._lock:
+            if since is not None and any(
+                    self._invalidatedAt.get(tag, 0) > since for tag in tags):
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (fragment, frozenset(tags), expires)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxSize:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, tag):
+        with self._lock:
+            self._generation += 1
+            self._invalidatedAt[tag] = self._generation
+            for key in list(self._tagged.get(tag, ())):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tagged.clear()
+
+    def _drop(self, key):
+        fragment, tags, expires = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
@@ -0,0 +1,215 @@
+"""Opt-in request metrics and a sampling profiler for the Flask app.
+
+Set GUDLFT_METRICS=1 to record per-route latency and the time spent in
+lookups, bookings and template rendering, exposed at /metrics in the
+Prometheus text format. GUDLFT_PROFILE=1 also starts the sampling profiler,
+which can be switched on and off at runtime through /metrics/profiler.
+That endpoint is only served when GUDLFT_METRICS_TOKEN is set, and
+requires the token as a bearer token.
+"""
+import hmac
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+from flask import Response, abort, g, request
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0)
+DISABLED = nullcontext()
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Latency histograms and counters, cheap no-ops while disabled."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + amount
+
+    def timed(self, section):
+        if not self.enabled:
+            return DISABLED
+        return self._timed(section)
+
+    @contextmanager
+    def _timed(self, section):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('gudlft_section_duration_seconds',
+                         {'section': section}, time.perf_counter() - start)
+
+    def exposition(self, extra=()):
+        """Everything recorded so far, in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        seen = set()
+        for (name, labels), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append('# TYPE {} histogram'.format(name))
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    name, _labels(labels + (('le', str(bound)),)),
+                    cumulative))
+            lines.append('{}_sum{} {}'.format(
+                name, _labels(labels), histogram.sum))
+            lines.append('{}_count{} {}'.format(
+                name, _labels(labels), histogram.count))
+        for name, value in list(counters) + list(extra):
+            lines.append('# TYPE {} counter'.format(name))
+            lines.append('{} {}'.format(name, value))
+        return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval.
+
+    Overhead is bounded by the interval, the stack depth kept and the
+    number of distinct stacks counted; stacks beyond `maxStacks` are
+    lumped together.
+    """
+
+    def __init__(self, interval=0.01, depth=32, maxStacks=2000):
+        self.interval = interval
+        self.depth = depth
+        self.maxStacks = maxStacks
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._control = threading.Lock()
+        self._stacks = {}
+        self._running = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def start(self):
+        with self._control:
+            if self.running:
+                return
+            if self._thread is not None:
+                # A stopped sampler exits within one interval.
+                self._thread.join()
+            self._running.set()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+
+    def reset(self):
+        with self._lock:
+            self._stacks = {}
+            self.samples = 0
+
+    def collapsed(self):
+        """Sampled stacks in the collapsed format flame graph tools read."""
+        with self._lock:
+            stacks = sorted(self._stacks.items(), key=lambda item: -item[1])
+        return ''.join('{} {}\n'.format(';'.join(stack), count)
+                       for stack, count in stacks)
+
+    def _run(self):
+        own = threading.get_ident()
+        while self._running.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._record(frame)
+            time.sleep(self.interval)
+
+    def _record(self, frame):
+        stack = []
+        while frame is not None and len(stack) < self.depth:
+            code = frame.f_code
+            stack.append('{}:{}'.format(code.co_filename, code.co_name))
+            frame = frame.f_back
+        stack = tuple(reversed(stack))
+        with self._lock:
+            self.samples += 1
+            if stack not in self._stacks \
+                    and len(self._stacks) >= self.maxStacks:
+                stack = ('<other>',)
+            self._stacks[stack] = self._stacks.get(stack, 0) + 1
+
+
+def instrument(app, metrics, profiler, token=None):
+    """Time every request on `app` and serve the collected data."""
+
+    @app.before_request
+    def startTimer():
+        g.requestStart = time.perf_counter()
+
+    @app.after_request
+    def recordLatency(response):
+        start = g.pop('requestStart', None)
+        if start is not None:
+            metrics.observe('gudlft_request_duration_seconds',
+                            {'endpoint': request.endpoint or 'unknown',
+                             'method': request.method,
+                             'status': str(response.status_code)},
+                            time.perf_counter() - start)
+        return response
+
+    @app.route('/metrics')
+    def metricsExposition():
+        extra = [('gudlft_profiler_samples_total', profiler.samples)]
+        return Response(metrics.exposition(extra),
+                        mimetype='text/plain; version=0.0.4')
+
+    @app.route('/metrics/profiler', methods=['GET', 'POST'])
+    def profilerControl():
+        given = request.headers.get('Authorization', '')
+        if not token or not hmac.compare_digest(given, 'Bearer ' + token):
+            abort(403)
+        if request.method == 'POST':
+            if request.form.get('reset'):
+                profiler.reset()
+            if request.form.get('enabled') == 'on':
+                profiler.start()
+            elif request.form.get('enabled') == 'off':
+                profiler.stop()
+        return Response(profiler.collapsed(), mimetype='text/plain')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(
+        name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+        for name, value in labels) + '}'
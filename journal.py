@@ -0,0 +1,256 @@
+import json
+import mmap
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from booking import BookingError
+from jsonstream import iterSpans
+
+SEQUENCE_PATTERN = re.compile(r'"journalSequence":\s*(\d+)')
+
+
+class BookingJournal:
+    """Append-only, fsynced log of booking events.
+
+    Appends are group-committed: a writer thread drains every pending event,
+    writes them in one go and fsyncs once, so concurrent bookings share the
+    cost of a sync. It only waits `flushInterval` for more events when
+    several are already pending; a lone booking is written at once, and
+    whatever arrives during its sync shares the next one. Every event
+    carries a sequence number.
+
+    Once `compactEvery` events have been committed, bookings are paused
+    just long enough to call `snapshot(sequence)`, which captures the state
+    as of that sequence and returns a function that writes it out, and to
+    move the journal aside as a segment (`<path>.<sequence>`). The write
+    then runs while new bookings go to a fresh journal, and the segment is
+    deleted once it is done. Replay reads leftover segments first.
+    """
+
+    def __init__(self, path, snapshot=None, flushInterval=0.002,
+                 compactEvery=1000):
+        self.path = path
+        self.snapshot = snapshot
+        self.flushInterval = flushInterval
+        self.compactEvery = compactEvery
+        self._cond = threading.Condition()
+        self._pending = []
+        self._sequence = 0
+        self._committed = 0
+        self._sinceCompaction = 0
+        self._inFlight = 0
+        self._compacting = False
+        self._draining = False
+        self._closed = False
+        self._error = None
+        self._file = None
+        self._writer = None
+        self._validLength = None
+
+    def segments(self):
+        """Journals moved aside by compactions that have not finished."""
+        directory = os.path.dirname(self.path) or '.'
+        prefix = os.path.basename(self.path) + '.'
+        found = []
+        for name in os.listdir(directory):
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and suffix.isdigit():
+                found.append((int(suffix), os.path.join(directory, name)))
+        return [path for _, path in sorted(found)]
+
+    def replay(self):
+        """Yield the committed events, remembering where they end."""
+        for segment in self.segments():
+            yield from self._replay(segment)
+        self._validLength = 0
+        if os.path.exists(self.path):
+            for length, event in self._replay(self.path, lengths=True):
+                self._validLength += length
+                yield event
+
+    def _replay(self, path, lengths=False):
+        with open(path, 'rb') as journal:
+            for line in journal:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('Unterminated line')
+                    event = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    # A torn write at the tail of the file, never committed.
+                    break
+                self._sequence = max(self._sequence, event['seq'])
+                self._sinceCompaction += 1
+                yield (len(line), event) if lengths else event
+
+    def open(self, sequence=0):
+        if self._validLength is None:
+            for _ in self.replay():
+                pass
+        if os.path.exists(self.path) \
+                and os.path.getsize(self.path) > self._validLength:
+            # Drop a torn tail so new events start on a line of their own.
+            os.truncate(self.path, self._validLength)
+        self._sequence = self._committed = max(self._sequence, sequence)
+        self._file = open(self.path, 'a')
+        self._writer = threading.Thread(target=self._run, daemon=True)
+        self._writer.start()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+            self._file.close()
+
+    @contextmanager
+    def booking(self, event):
+        """Commit `event` durably, then let the caller apply it.
+
+        Compaction waits for every open booking block to finish, so the
+        snapshot it takes always includes the events it moves aside.
+        Raises BookingError once the journal is closed, or after a write
+        failed: later events could not be committed in order.
+        """
+        with self._cond:
+            while self._draining:
+                self._cond.wait()
+            self._check()
+            self._inFlight += 1
+            self._sequence += 1
+            sequence = self._sequence
+            self._pending.append(json.dumps(dict(event, seq=sequence)))
+            self._cond.notify_all()
+            while self._committed < sequence and self._error is None:
+                self._cond.wait()
+            if self._committed < sequence:
+                self._inFlight -= 1
+                self._cond.notify_all()
+                self._check()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._inFlight -= 1
+                self._cond.notify_all()
+                due = (not self._compacting and self.snapshot is not None
+                       and self._sinceCompaction >= self.compactEvery)
+                if due:
+                    self._compacting = True
+            if due:
+                threading.Thread(target=self._compact, daemon=True).start()
+
+    def _check(self):
+        if self._error is not None:
+            raise BookingError(
+                'Bookings could not be saved, please try again later.')
+        if self._closed or self._writer is None:
+            raise BookingError('Bookings are closed.')
+
+    def compact(self):
+        with self._cond:
+            while self._compacting:
+                self._cond.wait()
+            self._compacting = True
+        self._compact()
+
+    def _compact(self):
+        try:
+            with self._cond:
+                self._draining = True
+                try:
+                    while self._inFlight or self._pending:
+                        self._cond.wait()
+                    sequence = self._committed
+                    write = self.snapshot(sequence)
+                    segment = '{}.{}'.format(self.path, sequence)
+                    self._file.close()
+                    os.replace(self.path, segment)
+                    self._file = open(self.path, 'a')
+                    self._sinceCompaction = 0
+                finally:
+                    self._draining = False
+                    self._cond.notify_all()
+            # Bookings carry on into the new journal meanwhile.
+            write()
+            for old in self.segments():
+                if int(old.rsplit('.', 1)[1]) <= sequence:
+                    os.remove(old)
+        finally:
+            with self._cond:
+                self._compacting = False
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                crowded = len(self._pending) > 1
+            if crowded:
+                # Give concurrent bookings a moment to join this batch.
+                time.sleep(self.flushInterval)
+            with self._cond:
+                batch, self._pending = self._pending, []
+            try:
+                self._file.write(''.join(line + '\n' for line in batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError as error:
+                # Fail the waiting bookings rather than leave them hanging;
+                # a torn line is dropped at the next start.
+                with self._cond:
+                    self._error = error
+                    self._pending = []
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._committed += len(batch)
+                self._sinceCompaction += len(batch)
+                self._cond.notify_all()
+
+
+def snapshotSequence(path):
+    """Last journal sequence folded into the snapshot at `path`."""
+    with open(path) as snapshot:
+        match = SEQUENCE_PATTERN.search(snapshot.read(256))
+    return int(match.group(1)) if match else 0
+
+
+def writeSnapshot(path, key, changes, sequence):
+    """Rewrite the snapshot at `path` with `changes` applied.
+
+    `changes` maps record names to their new fields. Other records are
+    copied byte for byte, so the state captured for the snapshot is only
+    what changed since the previous one.
+    """
+    temporary = path + '.tmp'
+    with open(path, 'rb') as data:
+        source = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+    with open(path, encoding='latin-1', newline='') as stream, \
+            open(temporary, 'wb') as snapshot:
+        snapshot.write('{{\n    "journalSequence": {},\n    "{}": [\n'.format(
+            sequence, key).encode())
+        for position, (start, end, record) in enumerate(
+                iterSpans(stream, key)):
+            raw = source[start:end]
+            name = record['name']
+            if not name.isascii():
+                name = json.loads(raw.decode('utf-8'))['name']
+            if position:
+                snapshot.write(b',\n')
+            if name in changes:
+                snapshot.write(
+                    b'        ' + json.dumps(changes[name]).encode())
+            else:
+                snapshot.write(raw)
+        snapshot.write(b'\n    ]\n}\n')
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    source.close()
+    os.replace(temporary, path)
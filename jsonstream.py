@@ -0,0 +1,216 @@
+import hashlib
+import json
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE = ' \t\n\r'
+
+decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """A sliding text buffer over a file, refilled on demand."""
+
+    def __init__(self, stream, chunkSize):
+        self.stream = stream
+        self.chunkSize = chunkSize
+        self.buffer = ''
+        self.position = 0
+        self.offset = 0
+
+    def tell(self):
+        return self.offset + self.position
+
+    def fill(self):
+        chunk = self.stream.read(self.chunkSize)
+        if not chunk:
+            raise ValueError('Unexpected end of JSON document')
+        self.offset += self.position
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def peek(self):
+        while True:
+            while self.position < len(self.buffer):
+                if self.buffer[self.position] not in WHITESPACE:
+                    return self.buffer[self.position]
+                self.position += 1
+            self.fill()
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError('Expected {!r} at offset {}'.format(
+                character, self.position))
+        self.position += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                self.fill()
+                continue
+            # A number may have been cut at the end of the buffer.
+            if end == len(self.buffer) and self.buffer[end - 1] not in '}]"':
+                try:
+                    self.fill()
+                except ValueError:
+                    pass
+                else:
+                    continue
+            self.position = end
+            return value
+
+
+def iterRecords(stream, key, chunkSize=CHUNK_SIZE):
+    """Yield the items of the top-level array `key` one at a time.
+
+    Only one record (plus one chunk of text) is held in memory, whatever
+    the size of the file.
+    """
+    for start, end, record in iterSpans(stream, key, chunkSize):
+        yield record
+
+
+def iterSpans(stream, key, chunkSize=CHUNK_SIZE):
+    """Like iterRecords, with each record's start and end offsets."""
+    reader = _Reader(stream, chunkSize)
+    reader.expect('{')
+    while reader.peek() != '}':
+        name = reader.value()
+        reader.expect(':')
+        if name != key:
+            reader.value()
+        else:
+            reader.expect('[')
+            while reader.peek() != ']':
+                start = reader.tell()
+                record = reader.value()
+                yield start, reader.tell(), record
+                if reader.peek() == ',':
+                    reader.position += 1
+            return
+        if reader.peek() == ',':
+            reader.position += 1
+    raise KeyError(key)
+
+
+class RecordFile:
+    """Records of one JSON array, decoded from a memory map on demand.
+
+    The first open writes a binary index next to the file (`<path>.idx`):
+    the byte span of every record, and for each of `indexKeys` a sorted
+    table of value hashes with record positions. Later opens just map both
+    files, so start-up time does not depend on the number of records, and
+    `find` is a binary search over the mapped table.
+    Records fetched with `find` are cached, so callers can mutate them;
+    iteration decodes the others without keeping them.
+    """
+
+    def __init__(self, path, key, factory, indexKeys=()):
+        self.path = path
+        self.factory = factory
+        self._map = _mapFile(path)
+        stamp = os.stat(path)
+        header = {'stamp': [stamp.st_size, stamp.st_mtime_ns], 'key': key,
+                  'keys': list(indexKeys)}
+        index = self._openIndex(header)
+        if index is None:
+            self._buildIndex(header)
+            index = self._openIndex(header)
+        self._index, count, offset = index
+        self._spans = self._table(offset, 2 * count)
+        self._keys = {}
+        for indexKey in indexKeys:
+            offset += 16 * count
+            self._keys[indexKey] = (self._table(offset, count),
+                                    self._table(offset + 8 * count, count))
+        self._cache = {}
+
+    def __len__(self):
+        return len(self._spans) // 2
+
+    def __iter__(self):
+        for position in range(len(self)):
+            record = self._cache.get(position)
+            yield record if record is not None else self._decode(position)
+
+    def find(self, key, value):
+        hashes, positions = self._keys[key]
+        digest = _hash(value)
+        slot = bisect_left(hashes, digest)
+        while slot < len(hashes) and hashes[slot] == digest:
+            position = positions[slot]
+            record = self._cache.get(position)
+            if record is None:
+                record = self._decode(position)
+            if getattr(record, key) == value:
+                return self._cache.setdefault(position, record)
+            slot += 1
+        return None
+
+    def _decode(self, position):
+        start, end = self._spans[2 * position:2 * position + 2]
+        return self.factory(json.loads(self._map[start:end].decode('utf-8')))
+
+    def _table(self, offset, count):
+        return memoryview(self._index)[offset:offset + 8 * count].cast('Q')
+
+    def _openIndex(self, header):
+        try:
+            index = _mapFile(self.path + '.idx')
+        except (OSError, ValueError):
+            return None
+        end = index.find(b'\n')
+        try:
+            saved = json.loads(index[:end].decode('ascii'))
+        except ValueError:
+            return None
+        count = saved.pop('count', None)
+        if saved != header:
+            return None
+        return index, count, _align(end + 1)
+
+    def _buildIndex(self, header):
+        spans = array('Q')
+        values = {indexKey: [] for indexKey in header['keys']}
+        # Latin-1 maps bytes to characters one to one, so reader offsets are
+        # byte offsets; records with non-ASCII values are decoded again.
+        with open(self.path, encoding='latin-1', newline='') as stream:
+            for position, (start, end, record) in enumerate(
+                    iterSpans(stream, header['key'])):
+                spans.extend((start, end))
+                if not all(str(record[indexKey]).isascii()
+                           for indexKey in values):
+                    record = json.loads(self._map[start:end].decode('utf-8'))
+                for indexKey, entries in values.items():
+                    entries.append((_hash(record[indexKey]), position))
+        first = json.dumps(dict(header, count=len(spans) // 2)).encode()
+        temporary = self.path + '.idx.tmp'
+        with open(temporary, 'wb') as saved:
+            saved.write(first + b'\n')
+            saved.write(bytes(_align(len(first) + 1) - len(first) - 1))
+            spans.tofile(saved)
+            for entries in values.values():
+                entries.sort()
+                array('Q', (digest for digest, _ in entries)).tofile(saved)
+                array('Q', (position for _, position in entries)).tofile(saved)
+        os.replace(temporary, self.path + '.idx')
+
+
+def _mapFile(path):
+    with open(path, 'rb') as data:
+        return mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+def _hash(value):
+    digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8)
+    return int.from_bytes(digest.digest(), 'little')
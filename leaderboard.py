@@ -0,0 +1,56 @@
+import threading
+from bisect import bisect_left, insort
+
+from pagination import PER_PAGE, paginate
+
+
+class Leaderboard:
+    """Clubs ranked by points, kept sorted as bookings spend points.
+
+    The board is built from `clubs` on first use. After that,
+    update(club) moves one club to its new rank and returns the pages
+    whose contents changed, so only those need re-rendering.
+    """
+
+    def __init__(self, clubs, perPage=PER_PAGE):
+        self.clubs = clubs
+        self.perPage = perPage
+        self._lock = threading.Lock()
+        self._keys = None
+        self._points = {}
+
+    def page(self, number):
+        with self._lock:
+            self._build()
+            page = paginate(self._keys, number, self.perPage,
+                            total=len(self._keys))
+            offset = (page.number - 1) * self.perPage
+            page.items = [
+                {'rank': offset + position + 1, 'name': name,
+                 'points': -points}
+                for position, (points, name) in enumerate(page.items)]
+            return page
+
+    def update(self, club):
+        """Re-rank `club`; return the page numbers that changed."""
+        with self._lock:
+            if self._keys is None:
+                return range(0)
+            oldKey = (-self._points[club.name], club.name)
+            newKey = (-club.points, club.name)
+            if oldKey == newKey:
+                return range(0)
+            oldIndex = bisect_left(self._keys, oldKey)
+            del self._keys[oldIndex]
+            insort(self._keys, newKey)
+            newIndex = bisect_left(self._keys, newKey)
+            self._points[club.name] = club.points
+        low, high = sorted((oldIndex, newIndex))
+        return range(low // self.perPage + 1, high // self.perPage + 2)
+
+    def _build(self):
+        if self._keys is None:
+            for club in self.clubs:
+                self._points[club.name] = club.points
+            self._keys = sorted(
+                (-points, name) for name, points in self._points.items())
@@ -0,0 +1,38 @@
+class Record:
+    """A compact record: fixed __slots__, numbers parsed once at load time.
+
+    Templates keep using record['field']; Jinja falls back to attribute
+    lookup when subscripting fails.
+    """
+
+    __slots__ = ()
+    numericFields = ()
+
+    def __init__(self, **fields):
+        for field in self.__slots__:
+            value = fields[field]
+            if field in self.numericFields:
+                value = int(value)
+            setattr(self, field, value)
+
+    @classmethod
+    def fromDict(cls, data):
+        return cls(**{field: data[field] for field in cls.__slots__})
+
+    def toDict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(field, getattr(self, field))
+            for field in self.__slots__))
+
+
+class Club(Record):
+    __slots__ = ('name', 'email', 'points')
+    numericFields = ('points',)
+
+
+class Competition(Record):
+    __slots__ = ('name', 'date', 'numberOfPlaces')
+    numericFields = ('numberOfPlaces',)
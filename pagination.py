@@ -0,0 +1,44 @@
+from itertools import islice
+
+PER_PAGE = 20
+
+
+class Page:
+    """One page of a result set, with what templates need to link around."""
+
+    def __init__(self, items, number, perPage, total):
+        self.items = items
+        self.number = number
+        self.perPage = perPage
+        self.total = total
+
+    @property
+    def pages(self):
+        return max(1, -(-self.total // self.perPage))
+
+    @property
+    def hasPrevious(self):
+        return self.number > 1
+
+    @property
+    def hasNext(self):
+        return self.number < self.pages
+
+
+def paginate(items, number, perPage=PER_PAGE, total=None):
+    """Slice page `number` (1-based) out of `items`.
+
+    `items` can be any iterable when `total` is given; sequences are
+    sliced, other iterables are consumed up to the end of the page.
+    """
+    if total is None:
+        items = list(items)
+        total = len(items)
+    pages = max(1, -(-total // perPage))
+    number = min(max(1, number), pages)
+    start = (number - 1) * perPage
+    if hasattr(items, '__getitem__'):
+        pageItems = list(items[start:start + perPage])
+    else:
+        pageItems = list(islice(items, start, start + perPage))
+    return Page(pageItems, number, perPage, total)
@@ -0,0 +1,81 @@
+class Registry:
+    """Records kept in load order with O(1) indexes on some of their keys.
+
+    Lookups return None when nothing matches, and every mutation goes
+    through add/update/remove so the indexes never drift from the records.
+
+    `records` may also be a lazy source with its own indexes (see
+    jsonstream.RecordFile). Its records are then only decoded when looked
+    up or iterated, and the registry just tracks what changed since load.
+    """
+
+    def __init__(self, records, keys):
+        self._records = {}
+        self._indexes = {key: {} for key in keys}
+        self._source = None
+        self._hidden = {key: set() for key in keys}
+        self._removed = 0
+        if hasattr(records, 'find'):
+            self._source = records
+        else:
+            for record in records:
+                self.add(record)
+
+    def __iter__(self):
+        if self._source is not None:
+            for record in self._source:
+                if not self._isHidden(record):
+                    yield record
+        yield from self._records.values()
+
+    def __len__(self):
+        size = len(self._records)
+        if self._source is not None:
+            size += len(self._source) - self._removed
+        return size
+
+    def get(self, key, value):
+        record = self._indexes[key].get(value)
+        if record is None and self._source is not None \
+                and value not in self._hidden[key]:
+            record = self._source.find(key, value)
+        return record
+
+    def add(self, record):
+        for key in self._indexes:
+            if self.get(key, getattr(record, key)) is not None:
+                raise ValueError(
+                    'Duplicate {} {!r}'.format(key, getattr(record, key)))
+        self._records[id(record)] = record
+        for key, index in self._indexes.items():
+            index[getattr(record, key)] = record
+
+    def update(self, record, **changes):
+        for key, value in changes.items():
+            index = self._indexes.get(key)
+            current = getattr(record, key)
+            if index is not None and value != current:
+                if self.get(key, value) is not None:
+                    raise ValueError('Duplicate {} {!r}'.format(key, value))
+                index.pop(current, None)
+                self._hidden[key].add(current)
+                index[value] = record
+            setattr(record, key, value)
+
+    def remove(self, record):
+        """Drop `record`; records not (or no longer) here are ignored."""
+        if self._records.pop(id(record), None) is None:
+            key = next(iter(self._indexes))
+            if self.get(key, getattr(record, key)) is None:
+                return
+            self._removed += 1
+        for key, index in self._indexes.items():
+            index.pop(getattr(record, key), None)
+            self._hidden[key].add(getattr(record, key))
+
+    def _isHidden(self, record):
+        for key, hidden in self._hidden.items():
+            value = getattr(record, key)
+            if value in hidden and self._indexes[key].get(value) is not record:
+                return True
+        return False
@@ -1,68 +1,272 @@
 import json
-from flask import Flask, render_template, request, redirect, flash, url_for
+import os
+import time
+from datetime import datetime, timedelta
+from flask import Flask, render_template, request, redirect, flash, url_for, \
+    make_response, session, Markup
+
+from booking import BookingEngine, BookingError
+from fragments import FragmentCache
+from instrumentation import Metrics, SamplingProfiler, instrument
+from pagination import paginate
+from registry import Registry
+from storage import JsonStorage, SqliteStorage
+
+
+def loadStorage():
+    if os.environ.get('GUDLFT_DATABASE'):
+        return SqliteStorage(os.environ['GUDLFT_DATABASE'])
+    return JsonStorage()
 
 
 def loadClubs():
-    with open('clubs.json') as c:
-        listOfClubs = json.load(c)['clubs']
-        return listOfClubs
+    return storage.loadClubs()
 
 
 def loadCompetitions():
-    with open('competitions.json') as comps:
-        listOfCompetitions = json.load(comps)['competitions']
-        return listOfCompetitions
+    return storage.loadCompetitions()
 
 
 app = Flask(__name__)
 app.secret_key = 'something_special'
 
-competitions = loadCompetitions()
-clubs = loadClubs()
+metrics = Metrics(enabled=bool(os.environ.get('GUDLFT_METRICS')))
+profiler = SamplingProfiler()
+if metrics.enabled:
+    instrument(app, metrics, profiler,
+               token=os.environ.get('GUDLFT_METRICS_TOKEN'))
+    if os.environ.get('GUDLFT_PROFILE'):
+        profiler.start()
+
+with metrics.timed('load'):
+    storage = loadStorage()
+    competitions = Registry(loadCompetitions(), keys=('name',))
+    clubs = Registry(loadClubs(), keys=('email', 'name'))
+    storage.open(competitions, clubs)
+    storage.release()
+engine = BookingEngine(competitions, clubs, storage)
+catalogue = storage.catalogue(competitions)
+fragments = FragmentCache()
+leaderboard = storage.leaderboard(clubs)
+pointsCache = FragmentCache()
+
+POINTS_MAX_AGE = 10
+# How long a cached fragment is trusted when other processes book too.
+SHARED_MAX_AGE = 2
+
+FILTERS = ('all', 'upcoming', 'available')
+
+
+def findClub(key, value):
+    metrics.count('gudlft_lookups_total')
+    with metrics.timed('lookup'):
+        return clubs.get(key, value)
+
+
+def findCompetition(name):
+    metrics.count('gudlft_lookups_total')
+    with metrics.timed('lookup'):
+        return competitions.get('name', name)
+
+
+def render(template, **context):
+    with metrics.timed('render'):
+        return render_template(template, **context)
+
+
+def sharedExpiry(expires=None):
+    """Bring `expires` forward when the storage is shared."""
+    if not storage.shared:
+        return expires
+    limit = time.time() + SHARED_MAX_AGE
+    return limit if expires is None else min(expires, limit)
+
+
+def listCompetitions(show, start, end, page):
+    """The requested page of competitions, and when it goes stale."""
+    now = datetime.now()
+    start = datetime.strptime(start, '%Y-%m-%d') if start else None
+    end = datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1) \
+        if end else None
+    if show == 'upcoming':
+        start = max(start or now, now)
+    selected = catalogue.between(start, end, available=show == 'available')
+    expires = None
+    if show == 'upcoming' and len(selected):
+        # The listing shifts as soon as its first competition starts.
+        expires = catalogue.date(selected[0]).timestamp()
+    return paginate(selected, page, total=len(selected)), sharedExpiry(expires)
+
+
+def dateArgument(name):
+    value = request.args.get(name, '')
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return ''
+    return value
+
+
+def renderCompetitions():
+    show = request.args.get('show', 'all')
+    if show not in FILTERS:
+        show = 'all'
+    start = dateArgument('start')
+    end = dateArgument('end')
+    page = request.args.get('page', 1, type=int)
+    key = (show, start, end, page)
+    fragment = fragments.get(key)
+    if fragment is None:
+        generation = fragments.generation()
+        competitionsPage, expires = listCompetitions(show, start, end, page)
+        fragment = Markup(render(
+            'competitions.html', page=competitionsPage, show=show,
+            start=start, end=end))
+        tags = [competition.name for competition in competitionsPage.items]
+        tags.append(show)
+        fragments.set(key, fragment, tags, expires, since=generation)
+    return fragment
+
+
+def renderSummary(club):
+    return render('welcome.html', club=club,
+                  competitionsList=renderCompetitions())
+
+
+@app.teardown_appcontext
+def releaseStorage(error):
+    storage.release()
 
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render('index.html')
 
 
 @app.route('/showSummary', methods=['POST'])
 def showSummary():
-    club = [club for club in clubs if club['email'] == request.form['email']][
-        0]
-    return render_template('welcome.html', club=club,
-                           competitions=competitions)
+    club = findClub('email', request.form['email'])
+    if club is None:
+        flash("Sorry, that email wasn't found.")
+        return render('index.html')
+    session['club'] = club.name
+    return renderSummary(club)
+
+
+def sessionClub(name=None):
+    """The club logged in with /showSummary, if it still exists.
+
+    With `name`, only that club: a page naming another club gets nothing.
+    """
+    loggedIn = session.get('club')
+    if loggedIn is None or name not in (None, loggedIn):
+        return None
+    return findClub('name', loggedIn)
+
+
+@app.route('/summary')
+def clubSummary():
+    club = sessionClub()
+    if club is None:
+        flash("Please log in with your email first.")
+        return render('index.html')
+    response = make_response(renderSummary(club))
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@app.route('/book/<competition>')
+def bookCompetition(competition):
+    club = sessionClub()
+    if club is None:
+        flash("Please log in with your email first.")
+        return render('index.html')
+    return book(competition, club.name)
 
 
 @app.route('/book/<competition>/<club>')
 def book(competition, club):
-    foundClub = [c for c in clubs if c['name'] == club][0]
-    foundCompetition = [c for c in competitions if c['name'] == competition][0]
-    if foundClub and foundCompetition:
-        return render_template('booking.html', club=foundClub,
-                               competition=foundCompetition)
-    else:
-        flash("Something went wrong-please try again")
-        return render_template('welcome.html', club=club,
-                               competitions=competitions)
+    foundClub = sessionClub(club)
+    if foundClub is None:
+        flash("Please log in with your email first.")
+        return render('index.html')
+    foundCompetition = findCompetition(competition)
+    if foundCompetition:
+        if catalogue.isPast(foundCompetition):
+            flash("This competition is over, it can't be booked anymore.")
+            return renderSummary(foundClub)
+        return render('booking.html', club=foundClub,
+                      competition=foundCompetition)
+    flash("Something went wrong-please try again")
+    return renderSummary(foundClub)
 
 
 @app.route('/purchasePlaces', methods=['POST'])
 def purchasePlaces():
-    competition = \
-    [c for c in competitions if c['name'] == request.form['competition']][0]
-    club = [c for c in clubs if c['name'] == request.form['club']][0]
-    placesRequired = int(request.form['places'])
-    competition['numberOfPlaces'] = int(
-        competition['numberOfPlaces']) - placesRequired
-    flash('Great-booking complete!')
-    return render_template('welcome.html', club=club,
-                           competitions=competitions)
+    club = sessionClub(request.form['club'])
+    if club is None:
+        flash("Please log in with your email first.")
+        return render('index.html')
+    competition = findCompetition(request.form['competition'])
+    if competition is None:
+        flash("Something went wrong-please try again")
+        return render('index.html')
+    if catalogue.isPast(competition):
+        flash("This competition is over, it can't be booked anymore.")
+        return renderSummary(club)
+    try:
+        places = int(request.form['places'])
+    except ValueError:
+        flash('Please enter a number of places.')
+        return renderSummary(club)
+    try:
+        with metrics.timed('booking'):
+            engine.book(competition, club, places)
+    except BookingError as error:
+        flash(str(error))
+    else:
+        catalogue.updated(competition)
+        fragments.invalidate(competition.name)
+        if competition.numberOfPlaces == 0:
+            fragments.invalidate('available')
+        for number in leaderboard.update(club):
+            pointsCache.invalidate(('points', number))
+        flash('Great-booking complete!')
+    return renderSummary(club)
+
+
+def renderPoints(number, asJson):
+    page = leaderboard.page(number)
+    if asJson:
+        body = json.dumps({'page': page.number, 'pages': page.pages,
+                           'total': page.total, 'clubs': page.items})
+    else:
+        body = render('points.html', page=page)
+    return body, page.number
 
 
-# TODO: Add route for points display
+@app.route('/points')
+def pointsBoard():
+    number = request.args.get('page', 1, type=int)
+    asJson = request.args.get('format') == 'json'
+    key = ('json' if asJson else 'html', number)
+    body = pointsCache.get(key)
+    if body is None:
+        generation = pointsCache.generation()
+        body, number = renderPoints(number, asJson)
+        pointsCache.set(key, body, tags=[('points', number)],
+                        expires=sharedExpiry(), since=generation)
+    response = make_response(body)
+    if asJson:
+        response.mimetype = 'application/json'
+    response.headers['Cache-Control'] = 'public, max-age={}'.format(
+        POINTS_MAX_AGE)
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 @app.route('/logout')
 def logout():
+    session.pop('club', None)
     return redirect(url_for('index'))
@@ -0,0 +1,459 @@
+"""Where clubs, competitions and bookings live.
+
+Both backends expose the same interface: loadClubs/loadCompetitions return
+the records to index, catalogue/leaderboard the views ranking them,
+open/close bracket the app's lifetime, release() ends a request's use of
+the storage, and booking() makes a booking event durable around the
+in-memory update. `shared` tells whether other
+processes may change the data, so caches of it should expire.
+
+Bulk import into SQLite:
+
+    python storage.py import gudlft.db clubs.json competitions.json
+"""
+import argparse
+import atexit
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
+
+from booking import BookingError
+from catalogue import DATE_FORMAT, CompetitionCatalogue
+from journal import BookingJournal, snapshotSequence, writeSnapshot
+from jsonstream import RecordFile, iterRecords
+from leaderboard import Leaderboard
+from models import Club, Competition
+from pagination import PER_PAGE, paginate
+
+
+class JsonStorage:
+    """JSON snapshots plus the booking journal.
+
+    With `lazy` set, the loaders return memory-mapped RecordFiles, so start
+    up only costs loading their offset index. Otherwise the files are
+    parsed incrementally, one record at a time.
+    """
+
+    shared = False
+
+    def __init__(self, clubsPath='clubs.json',
+                 competitionsPath='competitions.json',
+                 journalPath='bookings.journal', lazy=True):
+        self.clubsPath = clubsPath
+        self.competitionsPath = competitionsPath
+        self.lazy = lazy
+        self.journal = BookingJournal(journalPath, snapshot=self.saveSnapshot)
+        self.competitions = None
+        self.clubs = None
+        self._changed = {'competitions': set(), 'clubs': set()}
+
+    def loadClubs(self):
+        if self.lazy:
+            return RecordFile(self.clubsPath, 'clubs', Club.fromDict,
+                              indexKeys=('email', 'name'))
+        with open(self.clubsPath) as c:
+            return [Club.fromDict(club) for club in iterRecords(c, 'clubs')]
+
+    def loadCompetitions(self):
+        if self.lazy:
+            return RecordFile(self.competitionsPath, 'competitions',
+                              Competition.fromDict, indexKeys=('name',))
+        with open(self.competitionsPath) as comps:
+            return [Competition.fromDict(competition)
+                    for competition in iterRecords(comps, 'competitions')]
+
+    def catalogue(self, competitions):
+        return CompetitionCatalogue(competitions)
+
+    def release(self):
+        pass
+
+    def leaderboard(self, clubs):
+        return Leaderboard(clubs)
+
+    def open(self, competitions, clubs):
+        self.competitions = competitions
+        self.clubs = clubs
+        competitionsSequence = snapshotSequence(self.competitionsPath)
+        clubsSequence = snapshotSequence(self.clubsPath)
+        for event in self.journal.replay():
+            competition = competitions.get('name', event['competition'])
+            if event['seq'] > competitionsSequence and competition is not None:
+                placesLeft = competition.numberOfPlaces - event['places']
+                competitions.update(competition, numberOfPlaces=placesLeft)
+                self._changed['competitions'].add(competition.name)
+            club = clubs.get('name', event['club'])
+            if event['seq'] > clubsSequence and club is not None:
+                clubs.update(club, points=club.points - event.get('points', 0))
+                self._changed['clubs'].add(club.name)
+        self.journal.open(max(competitionsSequence, clubsSequence))
+        atexit.register(self.close)
+
+    def close(self):
+        self.journal.close()
+
+    @contextmanager
+    def booking(self, event):
+        with self.journal.booking(event):
+            yield
+            self._changed['competitions'].add(event['competition'])
+            self._changed['clubs'].add(event['club'])
+
+    def saveSnapshot(self, sequence):
+        """Capture what changed up to `sequence`; return the slow write.
+
+        Called by the journal while no booking is in flight.
+        """
+        changes = {}
+        for key, registry in (('competitions', self.competitions),
+                              ('clubs', self.clubs)):
+            names, self._changed[key] = self._changed[key], set()
+            records = (registry.get('name', name) for name in names)
+            changes[key] = {record.name: record.toDict()
+                            for record in records if record is not None}
+
+        def write():
+            writeSnapshot(self.competitionsPath, 'competitions',
+                          changes['competitions'], sequence)
+            writeSnapshot(self.clubsPath, 'clubs', changes['clubs'], sequence)
+            if self.lazy:
+                # Index the new snapshots now rather than at the next start.
+                self.loadCompetitions()
+                self.loadClubs()
+        return write
+
+
+class SqliteStorage:
+    """SQLite backend with a bounded pool of connections.
+
+    A thread checks a connection out on first use and keeps it until
+    release(), which the app calls when each request ends; past `poolSize`
+    connections, threads wait up to `timeout` seconds for one to be freed.
+
+    Statements are fixed strings with bound parameters, so sqlite3's
+    statement cache keeps them prepared. Bookings run in an immediate
+    transaction whose guarded UPDATEs re-check capacity and points, so the
+    invariants hold across worker processes too.
+
+    Records, the catalogue and the leaderboard are all queried from the
+    database when needed, so every worker sees the other workers' bookings.
+    """
+
+    shared = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS clubs (
+            name TEXT PRIMARY KEY,
+            email TEXT NOT NULL UNIQUE,
+            points INTEGER NOT NULL CHECK (points >= 0)
+        );
+        CREATE TABLE IF NOT EXISTS competitions (
+            name TEXT PRIMARY KEY,
+            date TEXT NOT NULL,
+            numberOfPlaces INTEGER NOT NULL CHECK (numberOfPlaces >= 0)
+        );
+        CREATE INDEX IF NOT EXISTS competitions_date ON competitions (date);
+        CREATE INDEX IF NOT EXISTS clubs_points ON clubs (points DESC, name);
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY,
+            competition TEXT NOT NULL REFERENCES competitions (name),
+            club TEXT NOT NULL REFERENCES clubs (name),
+            places INTEGER NOT NULL,
+            points INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS bookings_club ON bookings (club);
+    """
+    SELECT_CLUBS = 'SELECT name, email, points FROM clubs'
+    SELECT_COMPETITIONS = \
+        'SELECT name, date, numberOfPlaces FROM competitions ORDER BY date'
+    TAKE_PLACES = ('UPDATE competitions SET numberOfPlaces = '
+                   'numberOfPlaces - ? WHERE name = ? AND numberOfPlaces >= ?')
+    TAKE_POINTS = ('UPDATE clubs SET points = points - ? '
+                   'WHERE name = ? AND points >= ?')
+    INSERT_BOOKING = ('INSERT INTO bookings (competition, club, places, '
+                      'points) VALUES (?, ?, ?, ?)')
+    UPSERT_CLUB = ('INSERT OR REPLACE INTO clubs (name, email, points) '
+                   'VALUES (:name, :email, :points)')
+    UPSERT_COMPETITION = ('INSERT OR REPLACE INTO competitions '
+                          '(name, date, numberOfPlaces) '
+                          'VALUES (:name, :date, :numberOfPlaces)')
+
+    def __init__(self, path, cachedStatements=64, poolSize=16, timeout=30):
+        self.path = path
+        self.cachedStatements = cachedStatements
+        self.poolSize = poolSize
+        self.timeout = timeout
+        self._local = threading.local()
+        self._pool = queue.Queue()
+        self._connections = []
+        self._guard = threading.Lock()
+        self.connection().executescript(self.SCHEMA)
+        self.release()
+
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._checkout()
+        return connection
+
+    def release(self):
+        """Give the calling thread's connection back to the pool."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self._local.connection = None
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            self._pool.put(connection)
+
+    def _checkout(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._guard:
+            if len(self._connections) < self.poolSize:
+                connection = self._connect()
+                self._connections.append(connection)
+                return connection
+        try:
+            return self._pool.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                'No database connection freed within {}s'.format(
+                    self.timeout)) from None
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False,
+            cached_statements=self.cachedStatements)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('PRAGMA busy_timeout=5000')
+        return connection
+
+    def loadClubs(self):
+        return SqliteTable(self, 'clubs', Club, self.SELECT_CLUBS,
+                           ('email', 'name'))
+
+    def loadCompetitions(self):
+        return SqliteTable(self, 'competitions', Competition,
+                           self.SELECT_COMPETITIONS, ('name',))
+
+    def catalogue(self, competitions):
+        return SqliteCatalogue(self)
+
+    def leaderboard(self, clubs):
+        return SqliteLeaderboard(self)
+
+    def open(self, competitions, clubs):
+        atexit.register(self.close)
+
+    def close(self):
+        with self._guard:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+            self._pool = queue.Queue()
+        self._local = threading.local()
+
+    @contextmanager
+    def booking(self, event):
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = connection.execute(
+                self.TAKE_PLACES,
+                (event['places'], event['competition'], event['places']))
+            if cursor.rowcount != 1:
+                raise BookingError('Not enough places left.')
+            cursor = connection.execute(
+                self.TAKE_POINTS,
+                (event['points'], event['club'], event['points']))
+            if cursor.rowcount != 1:
+                raise BookingError('Not enough points available.')
+            connection.execute(
+                self.INSERT_BOOKING, (event['competition'], event['club'],
+                                      event['places'], event['points']))
+            yield
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        else:
+            connection.execute('COMMIT')
+
+    def importRecords(self, path, key, batchSize=5000):
+        statement = {'clubs': self.UPSERT_CLUB,
+                     'competitions': self.UPSERT_COMPETITION}[key]
+        connection = self.connection()
+        total = 0
+        with open(path) as stream:
+            records = iterRecords(stream, key)
+            while True:
+                batch = list(islice(records, batchSize))
+                if not batch:
+                    return total
+                connection.execute('BEGIN')
+                try:
+                    connection.executemany(statement, batch)
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+                else:
+                    connection.execute('COMMIT')
+                total += len(batch)
+
+
+class SqliteTable:
+    """A table as a lazy record source for Registry, like RecordFile.
+
+    Unlike RecordFile nothing is cached: every `find` reads the current row,
+    which other processes may have changed.
+    """
+
+    def __init__(self, storage, table, factory, select, indexKeys):
+        self.storage = storage
+        self.factory = factory
+        self._select = select
+        self._count = 'SELECT COUNT(*) FROM ' + table
+        self._find = {key: '{} WHERE {} = ?'.format(
+            select.split(' ORDER BY ')[0], key) for key in indexKeys}
+
+    def __len__(self):
+        return self.storage.connection().execute(self._count).fetchone()[0]
+
+    def __iter__(self):
+        for row in self.storage.connection().execute(self._select):
+            yield self.factory(**row)
+
+    def find(self, key, value):
+        row = self.storage.connection().execute(
+            self._find[key], (value,)).fetchone()
+        return None if row is None else self.factory(**row)
+
+
+class SqliteRange:
+    """Rows of a query, counted and sliced with LIMIT/OFFSET on demand."""
+
+    def __init__(self, storage, factory, select, count, parameters):
+        self.storage = storage
+        self.factory = factory
+        self.select = select
+        self.count = count
+        self.parameters = parameters
+        self._length = None
+
+    def __len__(self):
+        if self._length is None:
+            self._length = self.storage.connection().execute(
+                self.count, self.parameters).fetchone()[0]
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            rows = self.storage.connection().execute(
+                self.select + ' LIMIT ? OFFSET ?',
+                self.parameters + (max(0, stop - start), start))
+            return [self.factory(**row) for row in rows][::step]
+        if index < 0:
+            index += len(self)
+        items = self[index:index + 1]
+        if not items:
+            raise IndexError(index)
+        return items[0]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+class SqliteCatalogue(CompetitionCatalogue):
+    """The competition catalogue, queried from the indexed date column.
+
+    The in-memory key lists are never built, so add/remove/updated have
+    nothing to do.
+    """
+
+    def __init__(self, storage):
+        super().__init__(None)
+        self.storage = storage
+
+    def between(self, start=None, end=None, available=False):
+        conditions, parameters = [], ()
+        if start is not None:
+            conditions.append('date >= ?')
+            parameters += (start.strftime(DATE_FORMAT),)
+        if end is not None:
+            conditions.append('date < ?')
+            parameters += (end.strftime(DATE_FORMAT),)
+        if available:
+            conditions.append('numberOfPlaces > 0')
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        return SqliteRange(
+            self.storage, Competition,
+            'SELECT name, date, numberOfPlaces FROM competitions' + where
+            + ' ORDER BY date, name',
+            'SELECT COUNT(*) FROM competitions' + where, parameters)
+
+    def nextN(self, count, now=None, available=False):
+        upcoming = self.upcoming(now, available)
+        return upcoming[:count]
+
+
+class SqliteLeaderboard:
+    """Clubs ranked by points, read a page at a time through an index."""
+
+    PAGE = ('SELECT name, points FROM clubs ORDER BY points DESC, name '
+            'LIMIT ? OFFSET ?')
+    RANK = ('SELECT COUNT(*) FROM clubs '
+            'WHERE points > ? OR (points = ? AND name < ?)')
+
+    def __init__(self, storage, perPage=PER_PAGE):
+        self.storage = storage
+        self.perPage = perPage
+
+    def page(self, number):
+        connection = self.storage.connection()
+        total = connection.execute('SELECT COUNT(*) FROM clubs').fetchone()[0]
+        page = paginate((), number, self.perPage, total=total)
+        offset = (page.number - 1) * self.perPage
+        page.items = [
+            {'rank': offset + position + 1, 'name': row['name'],
+             'points': row['points']}
+            for position, row in enumerate(connection.execute(
+                self.PAGE, (self.perPage, offset)))]
+        return page
+
+    def update(self, club):
+        """Pages that may have changed now `club` spent points.
+
+        Spending only moves a club down, so that is every page down to its
+        new rank.
+        """
+        rank = self.storage.connection().execute(
+            self.RANK, (club.points, club.points, club.name)).fetchone()[0]
+        return range(1, rank // self.perPage + 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GUDLFT storage tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+    importer = commands.add_parser(
+        'import', help='stream JSON files into a SQLite database')
+    importer.add_argument('database')
+    importer.add_argument('clubs')
+    importer.add_argument('competitions')
+    importer.add_argument('--batch-size', type=int, default=5000)
+    arguments = parser.parse_args()
+    storage = SqliteStorage(arguments.database)
+    for key in ('clubs', 'competitions'):
+        count = storage.importRecords(getattr(arguments, key), key,
+                                      arguments.batch_size)
+        print('Imported {} {}'.format(count, key))
+    storage.close()
+
+
+if __name__ == '__main__':
+    main()
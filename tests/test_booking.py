@@ -0,0 +1,8 @@
+from benchmarks.stress_booking import stress
+
+
+def test_concurrent_bookings_never_oversell():
+    booked, placesLeft = stress(threads=16, places=200, attempts=30,
+                                points=40)
+    assert booked + placesLeft == 200
+    assert placesLeft == 0
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+from catalogue import CompetitionCatalogue
+from models import Competition
+from registry import Registry
+
+
+class Untouchable(list):
+    def __iter__(self):
+        raise AssertionError('The catalogue was built too early')
+
+
+def competition(name, date, places):
+    return Competition(name=name, date=date, numberOfPlaces=places)
+
+
+def test_dates_are_not_parsed_until_the_first_query():
+    spring = competition('Spring Festival', '2030-03-27 10:00:00', 25)
+    catalogue = CompetitionCatalogue(Untouchable([spring]))
+
+    assert not catalogue.isPast(spring, now=datetime(2030, 1, 1))
+    assert catalogue.isPast(spring, now=datetime(2031, 1, 1))
+    catalogue.updated(spring)
+
+
+def test_first_query_sorts_by_date_and_tracks_sell_outs():
+    fall = competition('Fall Classic', '2030-10-22 13:30:00', 13)
+    spring = competition('Spring Festival', '2030-03-27 10:00:00', 25)
+    competitions = Registry([fall, spring], ('name',))
+    catalogue = CompetitionCatalogue(competitions)
+
+    assert [c.name for c in catalogue.between()] \
+        == ['Spring Festival', 'Fall Classic']
+    competitions.update(spring, numberOfPlaces=0)
+    catalogue.updated(spring)
+    assert [c.name for c in catalogue.upcoming(now=datetime(2030, 1, 1),
+                                               available=True)] \
+        == ['Fall Classic']
+
+
+def test_added_and_removed_competitions_are_filed_by_date():
+    spring = competition('Spring Festival', '2030-03-27 10:00:00', 25)
+    fall = competition('Fall Classic', '2030-10-22 13:30:00', 13)
+    summer = competition('Summer Open', '2030-07-01 09:00:00', 0)
+    competitions = Registry([spring], ('name',))
+    catalogue = CompetitionCatalogue(competitions)
+
+    # Before the first query the build will pick up the registry as is.
+    competitions.add(fall)
+    catalogue.add(fall)
+    assert [c.name for c in catalogue.between()] \
+        == ['Spring Festival', 'Fall Classic']
+
+    competitions.add(summer)
+    catalogue.add(summer)
+    assert [c.name for c in catalogue.between()] \
+        == ['Spring Festival', 'Summer Open', 'Fall Classic']
+    assert [c.name for c in catalogue.between(available=True)] \
+        == ['Spring Festival', 'Fall Classic']
+
+    catalogue.remove(spring)
+    competitions.remove(spring)
+    assert [c.name for c in catalogue.between()] \
+        == ['Summer Open', 'Fall Classic']
+    assert [c.name for c in catalogue.nextN(1, now=datetime(2030, 1, 1),
+                                            available=True)] \
+        == ['Fall Classic']
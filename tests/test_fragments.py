@@ -0,0 +1,42 @@
+from fragments import FragmentCache
+
+
+def test_render_racing_an_invalidation_is_not_stored():
+    cache = FragmentCache()
+    generation = cache.generation()
+    # A booking invalidates the competition while the page renders.
+    cache.invalidate('Spring Festival')
+
+    cache.set('page', 'stale', tags=['Spring Festival'], since=generation)
+    assert cache.get('page') is None
+
+    cache.set('other', 'fresh', tags=['Fall Classic'], since=generation)
+    assert cache.get('other') == 'fresh'
+
+
+def test_invalidate_drops_tagged_fragments_only():
+    cache = FragmentCache()
+    cache.set('spring', 'a', tags=['Spring Festival', 'all'])
+    cache.set('fall', 'b', tags=['Fall Classic', 'all'])
+
+    cache.invalidate('Spring Festival')
+    assert cache.get('spring') is None
+    assert cache.get('fall') == 'b'
+    cache.invalidate('all')
+    assert cache.get('fall') is None
+
+
+def test_least_recently_used_fragment_is_evicted():
+    cache = FragmentCache(maxSize=2)
+    cache.set(1, 'one')
+    cache.set(2, 'two')
+    cache.get(1)
+    cache.set(3, 'three')
+    assert cache.get(2) is None
+    assert cache.get(1) == 'one'
+
+
+def test_expired_fragment_is_dropped():
+    cache = FragmentCache()
+    cache.set('upcoming', 'listing', expires=0)
+    assert cache.get('upcoming') is None
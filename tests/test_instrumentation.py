@@ -0,0 +1,24 @@
+from flask import Flask
+
+from instrumentation import Metrics, SamplingProfiler, instrument
+
+
+def client(token):
+    app = Flask(__name__)
+    instrument(app, Metrics(enabled=True), SamplingProfiler(), token=token)
+    return app.test_client()
+
+
+def test_profiler_endpoint_is_closed_without_a_token():
+    anonymous = client(None)
+    assert anonymous.get('/metrics/profiler').status_code == 403
+    assert anonymous.post('/metrics/profiler',
+                          data={'enabled': 'on'}).status_code == 403
+
+
+def test_profiler_endpoint_requires_the_configured_token():
+    guarded = client('s3cret')
+    assert guarded.get('/metrics/profiler').status_code == 403
+    response = guarded.get('/metrics/profiler',
+                           headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
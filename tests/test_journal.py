@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from booking import BookingError
+from journal import BookingJournal
+
+
+def book(journal, competition='Spring Festival', places=1):
+    with journal.booking({'competition': competition, 'club': 'Simply Lift',
+                          'places': places, 'points': places}):
+        pass
+
+
+def test_replay_returns_committed_events_in_order(tmp_path):
+    path = str(tmp_path / 'bookings.journal')
+    journal = BookingJournal(path)
+    journal.open()
+    book(journal, places=1)
+    book(journal, places=2)
+    journal.close()
+
+    events = list(BookingJournal(path).replay())
+
+    assert [event['places'] for event in events] == [1, 2]
+    assert [event['seq'] for event in events] == [1, 2]
+
+
+def test_torn_tail_is_dropped_before_new_bookings(tmp_path):
+    path = str(tmp_path / 'bookings.journal')
+    journal = BookingJournal(path)
+    journal.open()
+    book(journal, places=1)
+    journal.close()
+    with open(path, 'a') as damaged:
+        damaged.write('{"competition": "Spring Fes')
+
+    journal = BookingJournal(path)
+    assert len(list(journal.replay())) == 1
+    journal.open()
+    book(journal, places=2)
+    book(journal, places=3)
+    journal.close()
+
+    events = list(BookingJournal(path).replay())
+    assert [event['places'] for event in events] == [1, 2, 3]
+    assert [event['seq'] for event in events] == [1, 2, 3]
+    with open(path) as saved:
+        assert all(json.loads(line) for line in saved)
+
+
+def test_open_without_replay_still_drops_torn_tail(tmp_path):
+    path = str(tmp_path / 'bookings.journal')
+    with open(path, 'w') as damaged:
+        damaged.write('{"seq": 1, "places": 1}\n{"seq": 2, "pla')
+
+    journal = BookingJournal(path)
+    journal.open()
+    book(journal, places=5)
+    journal.close()
+
+    events = list(BookingJournal(path).replay())
+    assert [event['seq'] for event in events] == [1, 2]
+
+
+def test_bookings_go_on_while_the_snapshot_is_written(tmp_path):
+    path = str(tmp_path / 'bookings.journal')
+    writing = threading.Event()
+    release = threading.Event()
+    taken = []
+
+    def snapshot(sequence):
+        taken.append(sequence)
+
+        def write():
+            writing.set()
+            release.wait(5)
+        return write
+
+    journal = BookingJournal(path, snapshot=snapshot)
+    journal.open()
+    book(journal, places=1)
+    compaction = threading.Thread(target=journal.compact)
+    compaction.start()
+    assert writing.wait(5)
+
+    booked = threading.Thread(target=book, args=(journal,),
+                              kwargs={'places': 2})
+    booked.start()
+    booked.join(5)
+    assert not booked.is_alive()
+    assert os.path.exists(path + '.1')
+
+    release.set()
+    compaction.join(5)
+    journal.close()
+    assert taken == [1]
+    assert not os.path.exists(path + '.1')
+    events = list(BookingJournal(path).replay())
+    assert [event['seq'] for event in events] == [2]
+
+
+def test_replay_reads_segments_left_by_an_unfinished_compaction(tmp_path):
+    path = str(tmp_path / 'bookings.journal')
+    with open(path + '.2', 'w') as segment:
+        segment.write('{"seq": 1, "places": 1}\n{"seq": 2, "places": 1}\n')
+
+    journal = BookingJournal(path)
+    journal.open(sequence=0)
+    book(journal, places=3)
+    journal.close()
+
+    events = list(BookingJournal(path).replay())
+    assert [event['seq'] for event in events] == [1, 2, 3]
+
+
+def test_compaction_starts_after_compact_every_events(tmp_path):
+    path = str(tmp_path / 'bookings.journal')
+    taken = []
+    done = threading.Event()
+
+    def snapshot(sequence):
+        taken.append(sequence)
+        return done.set
+
+    journal = BookingJournal(path, snapshot=snapshot, compactEvery=2)
+    journal.open()
+    book(journal, places=1)
+    assert taken == []
+    book(journal, places=2)
+    assert done.wait(5)
+    book(journal, places=3)
+    journal.close()
+
+    assert taken == [2]
+    events = list(BookingJournal(path).replay())
+    assert [event['seq'] for event in events] == [3]
+
+
+def test_failed_write_fails_the_booking_instead_of_hanging(tmp_path,
+                                                           monkeypatch):
+    path = str(tmp_path / 'bookings.journal')
+    journal = BookingJournal(path)
+    journal.open()
+    book(journal, places=1)
+
+    def fsync(descriptor):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(os, 'fsync', fsync)
+    outcome = []
+
+    def attempt():
+        try:
+            book(journal, places=2)
+        except BookingError as error:
+            outcome.append(error)
+    booker = threading.Thread(target=attempt)
+    booker.start()
+    booker.join(5)
+
+    assert not booker.is_alive()
+    assert len(outcome) == 1
+    with pytest.raises(BookingError):
+        book(journal, places=3)
+    journal.close()
+
+
+def test_booking_after_close_is_refused(tmp_path):
+    journal = BookingJournal(str(tmp_path / 'bookings.journal'))
+    journal.open()
+    journal.close()
+    with pytest.raises(BookingError):
+        book(journal)
+
+
+def test_lone_booking_does_not_wait_for_company(tmp_path):
+    journal = BookingJournal(str(tmp_path / 'bookings.journal'),
+                             flushInterval=5)
+    journal.open()
+    started = time.perf_counter()
+    book(journal)
+    assert time.perf_counter() - started < 1
+    journal.close()
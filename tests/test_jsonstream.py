@@ -0,0 +1,57 @@
+import json
+import os
+
+from jsonstream import RecordFile, iterSpans
+from models import Club
+
+CLUBS = [
+    {'name': 'Simply Lift', 'email': 'john@simplylift.co', 'points': 13},
+    {'name': 'Société Générale', 'email': 'élise@sg.fr', 'points': 7},
+    {'name': 'She Lifts', 'email': 'kate@shelifts.co.uk', 'points': 12},
+]
+
+
+def write(path, clubs):
+    with open(path, 'w', encoding='utf-8') as data:
+        json.dump({'journalSequence': 3, 'clubs': clubs}, data, indent=4,
+                  ensure_ascii=False)
+
+
+def test_spans_survive_any_buffer_cut(tmp_path):
+    path = str(tmp_path / 'clubs.json')
+    write(path, CLUBS)
+    with open(path, 'rb') as data:
+        raw = data.read()
+
+    for chunkSize in (1, 2, 3, 7, 64, 1 << 16):
+        with open(path, encoding='latin-1', newline='') as stream:
+            spans = list(iterSpans(stream, 'clubs', chunkSize))
+        assert [json.loads(raw[start:end].decode('utf-8'))
+                for start, end, _ in spans] == CLUBS, chunkSize
+        assert [record['points'] for _, _, record in spans] == [13, 7, 12]
+
+
+def test_record_file_finds_non_ascii_values(tmp_path):
+    path = str(tmp_path / 'clubs.json')
+    write(path, CLUBS)
+    records = RecordFile(path, 'clubs', Club.fromDict, ('email', 'name'))
+
+    assert records.find('email', 'élise@sg.fr').name == 'Société Générale'
+    assert records.find('name', 'Société Générale').points == 7
+    assert records.find('name', 'Nobody') is None
+    assert [club.name for club in records] == [c['name'] for c in CLUBS]
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'clubs.json')
+    write(path, CLUBS)
+    RecordFile(path, 'clubs', Club.fromDict, ('name',))
+    built = os.stat(path + '.idx').st_mtime_ns
+
+    write(path, CLUBS + [{'name': 'Iron Temple',
+                          'email': 'admin@irontemple.com', 'points': 4}])
+    records = RecordFile(path, 'clubs', Club.fromDict, ('name',))
+
+    assert len(records) == 4
+    assert records.find('name', 'Iron Temple').points == 4
+    assert os.stat(path + '.idx').st_mtime_ns != built
@@ -0,0 +1,40 @@
+from leaderboard import Leaderboard
+from models import Club
+from registry import Registry
+
+
+def board():
+    clubs = Registry([Club(name='Club {}'.format(number),
+                           email='club{}@example.com'.format(number),
+                           points=50 - number) for number in range(5)],
+                     ('email', 'name'))
+    return clubs, Leaderboard(clubs, perPage=2)
+
+
+def test_update_returns_pages_between_old_and_new_rank():
+    clubs, leaderboard = board()
+    leaderboard.page(1)
+    club = clubs.get('name', 'Club 0')
+
+    clubs.update(club, points=47)
+    assert list(leaderboard.update(club)) == [1, 2]
+    assert [row['name'] for row in leaderboard.page(2).items] \
+        == ['Club 0', 'Club 3']
+
+
+def test_update_only_touches_the_clubs_own_page():
+    clubs, leaderboard = board()
+    leaderboard.page(1)
+    club = clubs.get('name', 'Club 4')
+    assert list(leaderboard.update(club)) == []
+    clubs.update(club, points=10)
+    assert list(leaderboard.update(club)) == [3]
+
+
+def test_update_before_the_first_page_is_free():
+    clubs, leaderboard = board()
+    club = clubs.get('name', 'Club 0')
+    clubs.update(club, points=0)
+    assert list(leaderboard.update(club)) == []
+    assert leaderboard.page(3).items == [
+        {'rank': 5, 'name': 'Club 0', 'points': 0}]
@@ -0,0 +1,24 @@
+from pagination import paginate
+
+
+def test_pages_are_sliced_and_clamped():
+    page = paginate(list(range(45)), 3, perPage=20)
+    assert page.items == list(range(40, 45))
+    assert (page.number, page.pages) == (3, 3)
+    assert page.hasPrevious and not page.hasNext
+
+    assert paginate(list(range(45)), 99, perPage=20).number == 3
+    assert paginate([], 0, perPage=20).items == []
+
+
+def test_iterables_are_only_consumed_to_the_page_end():
+    consumed = []
+
+    def numbers():
+        for number in range(100):
+            consumed.append(number)
+            yield number
+
+    page = paginate(numbers(), 2, perPage=10, total=100)
+    assert page.items == list(range(10, 20))
+    assert len(consumed) == 20
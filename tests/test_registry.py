@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from jsonstream import RecordFile
+from models import Club
+from registry import Registry
+
+
+def eagerClubs():
+    return Registry([
+        Club(name='Simply Lift', email='john@simplylift.co', points=13),
+        Club(name='Iron Temple', email='admin@irontemple.com', points=4)],
+        ('email', 'name'))
+
+
+def test_records_are_found_by_every_key():
+    clubs = eagerClubs()
+    assert clubs.get('email', 'john@simplylift.co').name == 'Simply Lift'
+    assert clubs.get('name', 'Iron Temple').points == 4
+    assert clubs.get('name', 'Nobody') is None
+    assert len(clubs) == 2
+
+
+def test_duplicate_keys_are_rejected():
+    clubs = eagerClubs()
+    with pytest.raises(ValueError):
+        clubs.add(Club(name='Simply Lift', email='other@example.com',
+                       points=1))
+    with pytest.raises(ValueError):
+        clubs.update(clubs.get('name', 'Iron Temple'),
+                     email='john@simplylift.co')
+
+
+def test_update_and_remove_keep_indexes_in_step():
+    clubs = eagerClubs()
+    club = clubs.get('name', 'Simply Lift')
+
+    clubs.update(club, email='john@simplylift.com')
+    assert clubs.get('email', 'john@simplylift.co') is None
+    assert clubs.get('email', 'john@simplylift.com') is club
+
+    clubs.remove(club)
+    assert clubs.get('name', 'Simply Lift') is None
+    assert [c.name for c in clubs] == ['Iron Temple']
+
+
+def lazyClubs(tmp_path):
+    path = str(tmp_path / 'clubs.json')
+    with open(path, 'w') as data:
+        json.dump({'clubs': [
+            {'name': 'Simply Lift', 'email': 'john@simplylift.co',
+             'points': '13'},
+            {'name': 'Iron Temple', 'email': 'admin@irontemple.com',
+             'points': '4'}]}, data)
+    source = RecordFile(path, 'clubs', Club.fromDict, ('email', 'name'))
+    return Registry(source, ('email', 'name'))
+
+
+def test_update_moves_a_lazy_record_to_its_new_key(tmp_path):
+    clubs = lazyClubs(tmp_path)
+    club = clubs.get('name', 'Simply Lift')
+
+    clubs.update(club, name='Simply Lifting', points=10)
+
+    assert clubs.get('name', 'Simply Lift') is None
+    assert clubs.get('name', 'Simply Lifting') is club
+    assert clubs.get('email', 'john@simplylift.co').points == 10
+    assert [c.name for c in clubs] == ['Simply Lifting', 'Iron Temple']
+    assert len(clubs) == 2
+
+
+def test_removed_lazy_record_is_gone_everywhere(tmp_path):
+    clubs = lazyClubs(tmp_path)
+
+    clubs.remove(clubs.get('name', 'Iron Temple'))
+
+    assert clubs.get('name', 'Iron Temple') is None
+    assert clubs.get('email', 'admin@irontemple.com') is None
+    assert [c.name for c in clubs] == ['Simply Lift']
+    assert len(clubs) == 1
+
+
+def test_removing_twice_is_harmless(tmp_path):
+    for clubs in (eagerClubs(), lazyClubs(tmp_path)):
+        club = clubs.get('name', 'Iron Temple')
+        clubs.remove(club)
+        clubs.remove(club)
+        clubs.remove(Club(name='Nobody', email='no@body.com', points=0))
+
+        assert len(clubs) == 1
+        assert [c.name for c in clubs] == ['Simply Lift']
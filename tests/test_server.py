@@ -0,0 +1,109 @@
+import importlib
+import json
+import sys
+
+import pytest
+
+CLUBS = [
+    {'name': 'Simply Lift', 'email': 'john@simplylift.co', 'points': '13'},
+    {'name': 'Iron Temple', 'email': 'admin@irontemple.com', 'points': '4'},
+    {'name': 'She Lifts', 'email': 'kate@shelifts.co.uk', 'points': '12'}]
+COMPETITIONS = [
+    {'name': 'Spring Festival', 'date': '2030-03-27 10:00:00',
+     'numberOfPlaces': '25'},
+    {'name': 'Fall Classic', 'date': '2020-10-22 13:30:00',
+     'numberOfPlaces': '13'}]
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    for key, records in (('clubs', CLUBS), ('competitions', COMPETITIONS)):
+        with open(str(tmp_path / (key + '.json')), 'w') as data:
+            json.dump({key: records}, data, indent=4)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('GUDLFT_DATABASE', raising=False)
+    sys.modules.pop('server', None)
+    module = importlib.import_module('server')
+    yield module
+    module.storage.close()
+    sys.modules.pop('server', None)
+
+
+def test_summary_requires_a_logged_in_club(server):
+    client = server.app.test_client()
+    response = client.get('/summary')
+    assert b'john@simplylift.co' not in response.data
+    assert b'Please log in' in response.data
+
+
+def test_summary_shows_the_session_club_only(server):
+    client = server.app.test_client()
+    client.post('/showSummary', data={'email': 'john@simplylift.co'})
+    response = client.get('/summary?show=all')
+    assert b'john@simplylift.co' in response.data
+    assert b'admin@irontemple.com' not in response.data
+
+    client.get('/logout')
+    assert b'john@simplylift.co' not in client.get('/summary').data
+
+
+def test_competition_fragments_are_shared_between_clubs(server):
+    for email in ('john@simplylift.co', 'admin@irontemple.com'):
+        client = server.app.test_client()
+        client.post('/showSummary', data={'email': email})
+        assert client.get('/summary').status_code == 200
+    assert list(server.fragments._entries) == [('all', '', '', 1)]
+
+
+def test_points_board_is_cached_until_a_booking_spends_points(server):
+    client = server.app.test_client()
+    first = client.get('/points?format=json')
+    assert first.headers['Cache-Control'] == 'public, max-age=10'
+    clubs = first.get_json()['clubs']
+    assert [club['rank'] for club in clubs] == [1, 2, 3]
+    assert client.get('/points?format=json', headers={
+        'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    client.post('/showSummary', data={'email': 'john@simplylift.co'})
+    client.post('/purchasePlaces', data={
+        'competition': 'Spring Festival', 'club': 'Simply Lift',
+        'places': '10'})
+    clubs = client.get('/points?format=json').get_json()['clubs']
+    assert clubs[-1] == {'rank': 3, 'name': 'Simply Lift', 'points': 3}
+
+
+def test_places_must_be_a_number(server):
+    client = server.app.test_client()
+    client.post('/showSummary', data={'email': 'john@simplylift.co'})
+    response = client.post('/purchasePlaces', data={
+        'competition': 'Spring Festival', 'club': 'Simply Lift',
+        'places': 'ten'})
+    assert b'Please enter a number of places.' in response.data
+    assert server.competitions.get(
+        'name', 'Spring Festival').numberOfPlaces == 25
+
+
+def test_booking_pages_need_the_named_club_logged_in(server):
+    client = server.app.test_client()
+    for response in (
+            client.get('/book/Nope/Simply%20Lift'),
+            client.get('/book/Fall%20Classic/Simply%20Lift'),
+            client.post('/purchasePlaces', data={
+                'competition': 'Spring Festival', 'club': 'Simply Lift',
+                'places': '1'})):
+        assert b'john@simplylift.co' not in response.data
+        assert b'Please log in' in response.data
+
+    client.post('/showSummary', data={'email': 'admin@irontemple.com'})
+    response = client.get('/book/Nope/Simply%20Lift')
+    assert b'john@simplylift.co' not in response.data
+    assert server.clubs.get('name', 'Simply Lift').points == 13
+    assert b'Something went wrong' in client.get(
+        '/book/Nope/Iron%20Temple').data
+
+
+def test_all_competitions_are_listed_by_date(server):
+    client = server.app.test_client()
+    client.post('/showSummary', data={'email': 'john@simplylift.co'})
+    page = client.get('/summary').data.decode()
+    assert page.index('Fall Classic') < page.index('Spring Festival')
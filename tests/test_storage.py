@@ -0,0 +1,153 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+
+from booking import BookingEngine
+from journal import snapshotSequence
+from models import Club, Competition
+from registry import Registry
+from storage import JsonStorage, SqliteStorage
+
+
+def write(path, key, records):
+    with open(path, 'w') as data:
+        json.dump({key: records}, data, indent=4)
+
+
+def test_compaction_rewrites_only_booked_records(tmp_path):
+    clubsPath = str(tmp_path / 'clubs.json')
+    competitionsPath = str(tmp_path / 'competitions.json')
+    write(clubsPath, 'clubs', [
+        {'name': 'Simply Lift', 'email': 'john@simplylift.co', 'points': '13'},
+        {'name': 'Iron Temple', 'email': 'admin@irontemple.com',
+         'points': '4'}])
+    write(competitionsPath, 'competitions', [
+        {'name': 'Spring Festival', 'date': '2030-03-27 10:00:00',
+         'numberOfPlaces': '25'},
+        {'name': 'Fête d’été', 'date': '2030-07-01 10:00:00',
+         'numberOfPlaces': '9'}])
+    storage = JsonStorage(clubsPath, competitionsPath,
+                          str(tmp_path / 'bookings.journal'))
+    clubs = Registry(storage.loadClubs(), ('email', 'name'))
+    competitions = Registry(storage.loadCompetitions(), ('name',))
+    storage.open(competitions, clubs)
+    for competition, places in (('Fête d’été', 2), ('Spring Festival', 1)):
+        with storage.booking({'competition': competition,
+                              'club': 'Simply Lift', 'places': places,
+                              'points': places}):
+            record = competitions.get('name', competition)
+            competitions.update(
+                record, numberOfPlaces=record.numberOfPlaces - places)
+            club = clubs.get('name', 'Simply Lift')
+            clubs.update(club, points=club.points - places)
+    storage.journal.compact()
+    storage.close()
+
+    assert snapshotSequence(clubsPath) == 2
+    assert snapshotSequence(competitionsPath) == 2
+    with open(clubsPath) as saved:
+        assert [int(club['points']) for club in json.load(saved)['clubs']] \
+            == [10, 4]
+    reopened = JsonStorage(clubsPath, competitionsPath,
+                           str(tmp_path / 'bookings.journal'))
+    places = {competition.name: competition.numberOfPlaces
+              for competition in reopened.loadCompetitions()}
+    assert places == {'Spring Festival': 24, 'Fête d’été': 7}
+    assert isinstance(reopened.loadClubs().find('email',
+                                                'admin@irontemple.com'), Club)
+    assert isinstance(next(iter(reopened.loadCompetitions())), Competition)
+
+
+def sqliteStorage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'gudlft.db'))
+    connection = storage.connection()
+    connection.executemany(storage.UPSERT_CLUB, [
+        {'name': 'Simply Lift', 'email': 'john@simplylift.co', 'points': 13},
+        {'name': 'Iron Temple', 'email': 'admin@irontemple.com', 'points': 4},
+        {'name': 'She Lifts', 'email': 'kate@shelifts.co.uk', 'points': 12}])
+    connection.executemany(storage.UPSERT_COMPETITION, [
+        {'name': 'Fall Classic', 'date': '2030-10-22 13:30:00',
+         'numberOfPlaces': 13},
+        {'name': 'Spring Festival', 'date': '2030-03-27 10:00:00',
+         'numberOfPlaces': 25}])
+    return storage
+
+
+def test_sqlite_records_are_read_when_looked_up(tmp_path):
+    storage = sqliteStorage(tmp_path)
+    clubs = Registry(storage.loadClubs(), ('email', 'name'))
+    competitions = Registry(storage.loadCompetitions(), ('name',))
+    assert len(clubs) == 3
+    assert [c.name for c in competitions] \
+        == ['Spring Festival', 'Fall Classic']
+
+    # Another worker process books through its own connection.
+    other = SqliteStorage(storage.path)
+    with other.booking({'competition': 'Spring Festival',
+                        'club': 'Simply Lift', 'places': 3, 'points': 3}):
+        pass
+
+    assert clubs.get('email', 'john@simplylift.co').points == 10
+    assert competitions.get('name', 'Spring Festival').numberOfPlaces == 22
+    assert clubs.get('name', 'Nobody') is None
+    other.close()
+    storage.close()
+
+
+def test_sqlite_catalogue_and_leaderboard_follow_bookings(tmp_path):
+    storage = sqliteStorage(tmp_path)
+    clubs = Registry(storage.loadClubs(), ('email', 'name'))
+    competitions = Registry(storage.loadCompetitions(), ('name',))
+    catalogue = storage.catalogue(competitions)
+    leaderboard = storage.leaderboard(clubs)
+    engine = BookingEngine(competitions, clubs, storage)
+    now = datetime(2030, 1, 1)
+
+    assert [c.name for c in catalogue.upcoming(now)] \
+        == ['Spring Festival', 'Fall Classic']
+    assert [club['name'] for club in leaderboard.page(1).items] \
+        == ['Simply Lift', 'She Lifts', 'Iron Temple']
+
+    club = clubs.get('name', 'Simply Lift')
+    engine.book(competitions.get('name', 'Fall Classic'), club, 13)
+    assert [c.name for c in catalogue.upcoming(now, available=True)] \
+        == ['Spring Festival']
+    assert [c.name for c in catalogue.nextN(1, now)] == ['Spring Festival']
+    assert [club['name'] for club in leaderboard.page(1).items] \
+        == ['She Lifts', 'Iron Temple', 'Simply Lift']
+    assert list(leaderboard.update(club)) == [1]
+    storage.close()
+
+
+def test_sqlite_connections_are_pooled_across_threads(tmp_path):
+    storage = sqliteStorage(tmp_path)
+    storage.release()
+
+    def request():
+        storage.loadClubs().find('name', 'Simply Lift')
+        storage.release()
+    for _ in range(50):
+        worker = threading.Thread(target=request)
+        worker.start()
+        worker.join()
+
+    assert len(storage._connections) == 1
+    storage.close()
+
+
+def test_failed_import_batch_is_rolled_back(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'gudlft.db'))
+    path = str(tmp_path / 'clubs.json')
+    write(path, 'clubs', [
+        {'name': 'Simply Lift', 'email': 'john@simplylift.co', 'points': 13},
+        {'name': 'In Debt', 'email': 'debt@example.com', 'points': -1}])
+
+    with pytest.raises(sqlite3.IntegrityError):
+        storage.importRecords(path, 'clubs')
+
+    assert not storage.connection().in_transaction
+    assert len(storage.loadClubs()) == 0
+    storage.close()